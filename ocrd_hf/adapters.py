@@ -1,41 +1,325 @@
 from __future__ import annotations
+import functools
 from typing import List, Sequence, Dict, Optional
+import numpy as np
 from PIL import Image
 import torch
 from transformers import (
     AutoConfig,
     AutoProcessor,
     AutoModelForVision2Seq,
+    GenerationConfig,
+    StoppingCriteria,
+    StoppingCriteriaList,
     TrOCRProcessor,
     VisionEncoderDecoderModel
 )
 
+
+# Config/processor loading re-reads JSON from disk (or worse, re-checks
+# the hub) on every call; repeated adapter construction with the same
+# model_id should pay that only once per process
+@functools.lru_cache(maxsize=32)
+def _cached_config(model_id: str):
+    return AutoConfig.from_pretrained(model_id)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_trocr_processor(model_id: str):
+    return TrOCRProcessor.from_pretrained(model_id)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_auto_processor(model_id: str):
+    return AutoProcessor.from_pretrained(model_id)
+
+
+class RepetitionStoppingCriteria(StoppingCriteria):
+    """
+    Stop decoding when every sequence in the batch ends in `window`
+    identical tokens — runaway repetition that further steps will not fix
+    (common on empty or degraded OCR lines).
+    """
+    def __init__(self, window: int = 12):
+        self.window = window
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> bool:
+        if input_ids.shape[1] < self.window:
+            return False
+        tail = input_ids[:, -self.window:]
+        return bool((tail == tail[:, :1]).all())
+
 class BaseHFAdapter:
     """
     Abstract interface for HF OCR backends.
     """
+    # Whether encode() yields encoder_outputs that generate() can consume;
+    # callers use this to decide if encode/generate can be pipelined
+    supports_encoder_outputs = True
+
     def __init__(
         self,
         model_id: str,
         device: str = "cpu",
         fp16: bool = False,
+        bf16: bool = False,
+        int8: bool = False,
         max_new_tokens: Optional[int] = None,
         quantize_kwargs: Optional[Dict] = None,
-        gen_kwargs: Optional[Dict] = None
+        gen_kwargs: Optional[Dict] = None,
+        compile: bool = False,
+        batch_size: int = 8
     ):
         self.model_id = model_id
         self.device = torch.device(device)
         self.fp16 = fp16
+        self.bf16 = bf16
+        self.int8 = int8
         self.max_new_tokens = max_new_tokens
+        self.batch_size = batch_size
         self.quantize_kwargs = quantize_kwargs or {}
         self.gen_kwargs = gen_kwargs or {}
+        self.compile = compile
+        # Autocast (mixed precision) instead of a full model .half() cast:
+        # layernorms and the generation cache stay in fp32, avoiding overflow.
+        if self.device.type == "cuda" and (fp16 or bf16):
+            self._amp_dtype = torch.bfloat16 if bf16 else torch.float16
+            self.quantize_kwargs.setdefault("torch_dtype", self._amp_dtype)
+        else:
+            self._amp_dtype = None
+        if int8 and self.device.type == "cuda":
+            from transformers import BitsAndBytesConfig
+            self.quantize_kwargs.setdefault(
+                "quantization_config",
+                BitsAndBytesConfig(load_in_8bit=True, llm_int8_threshold=6.0)
+            )
+
+    def _load_model(self, loader):
+        """
+        Load the model via `loader` (a from_pretrained classmethod),
+        preferring an efficient attention backend: flash_attention_2 when
+        available on CUDA with reduced precision, else SDPA, else whatever
+        the model defaults to (some OCR models register neither).
+        """
+        load_kwargs = dict(self.quantize_kwargs)
+        # Passing the already-parsed config skips a redundant re-read
+        load_kwargs.setdefault("config", _cached_config(self.model_id))
+        candidates = ["sdpa"]
+        if self._amp_dtype is not None and self.device.type == "cuda":
+            try:
+                import flash_attn  # noqa: F401
+                candidates.insert(0, "flash_attention_2")
+            except ImportError:
+                pass
+        for attn in candidates:
+            try:
+                return loader(
+                    self.model_id,
+                    attn_implementation=attn,
+                    **load_kwargs
+                )
+            except (ValueError, TypeError, ImportError):
+                continue
+        return loader(self.model_id, **load_kwargs)
+
+    def _place_model(self):
+        """
+        Move the model to the target device and switch to eval mode.
+
+        bitsandbytes-quantized models place their modules themselves during
+        from_pretrained, so the explicit .to() must be skipped for them.
+        """
+        if "quantization_config" not in self.quantize_kwargs:
+            self.model.to(self.device)
+        self.model.eval()
+
+    def _init_generation_config(self):
+        """
+        Freeze gen_kwargs and max_new_tokens into one GenerationConfig at
+        init, instead of rebuilding a kwargs dict on every generate call.
+        Pad/start token ids are resolved here once so transformers does not
+        re-derive them per call.
+        """
+        cfg = dict(self.model.generation_config.to_dict())
+        cfg.update(self.gen_kwargs)
+        if self.max_new_tokens is not None:
+            cfg["max_new_tokens"] = self.max_new_tokens
+        self._gen_config = GenerationConfig(**cfg)
+        model_cfg = self.model.config
+        if self._gen_config.pad_token_id is None:
+            pad_token_id = getattr(model_cfg, "pad_token_id", None)
+            if pad_token_id is None:
+                pad_token_id = self._gen_config.eos_token_id
+            self._gen_config.pad_token_id = pad_token_id
+        if self._gen_config.decoder_start_token_id is None:
+            self._gen_config.decoder_start_token_id = getattr(
+                model_cfg, "decoder_start_token_id", None
+            )
+        self._gen_config.use_cache = True
+        self._stopping_criteria = StoppingCriteriaList([RepetitionStoppingCriteria()])
+        if (
+            self.compile
+            and self.device.type == "cuda"
+            and getattr(self.model, "_supports_static_cache", False)
+        ):
+            # A static (preallocated) KV cache gives the decoder step a
+            # fixed shape, so Inductor can capture it as one CUDA graph
+            # instead of re-launching kernels per decoded token. Models
+            # without static-cache support (e.g. VisionEncoderDecoder/TrOCR)
+            # keep the default dynamic cache.
+            self._gen_config.cache_implementation = "static"
+
+    def _maybe_quantize_cpu(self):
+        """Weight-only INT8 quantization via Intel Neural Compressor on CPU."""
+        if not (self.int8 and self.device.type == "cpu"):
+            return
+        try:
+            from neural_compressor import PostTrainingQuantConfig
+            from neural_compressor.quantization import fit
+        except ImportError:
+            print(
+                "[Warning] int8 requested on CPU but neural_compressor "
+                "is not installed; keeping full-precision weights"
+            )
+            return
+        quantized = fit(
+            self.model,
+            conf=PostTrainingQuantConfig(approach="weight_only")
+        )
+        # fit() returns an INC wrapper; keep the underlying torch module so
+        # generation_config/encoder/generate accesses keep working
+        self.model = getattr(quantized, "model", quantized)
+
+    def _autocast(self):
+        return torch.autocast(
+            self.device.type,
+            dtype=self._amp_dtype,
+            enabled=self._amp_dtype is not None
+        )
+
+    def _maybe_compile_encoder(self, encoder):
+        """
+        Compile the encoder submodule with TorchDynamo/Inductor if requested.
+
+        Compiling the whole model is pointless here: `generate` is a Python
+        loop around `forward`, so the compiled graph would never be hit.
+        Instead we compile the encoder and call it explicitly in `generate`,
+        passing `encoder_outputs=` to `model.generate`.
+        """
+        if not self.compile:
+            return encoder
+        return torch.compile(encoder, mode="reduce-overhead", fullgraph=False)
+
+    def _init_preprocess_cache(self):
+        """
+        Cache the processor's target size and normalization constants so
+        `preprocess` can resize in uint8 on the PIL side and normalize in
+        one fused op on-device, instead of going through the processor's
+        per-image float32 numpy pipeline.
+        """
+        self._pp_size = None
+        # Pinned staging buffer, reused across batches (allocated lazily)
+        self._staging = None
+        self._staging_event = None
+        image_processor = getattr(self.processor, "image_processor", None)
+        if image_processor is None:
+            return
+        size = getattr(image_processor, "size", None)
+        if not isinstance(size, dict) or "height" not in size or "width" not in size:
+            return
+        # The fast path replicates exactly resize -> rescale -> normalize;
+        # any processor doing more (center-crop, pad) or less must keep
+        # going through the HF pipeline
+        if not (
+            getattr(image_processor, "do_resize", False)
+            and getattr(image_processor, "do_rescale", True)
+            and getattr(image_processor, "do_normalize", False)
+        ):
+            return
+        if getattr(image_processor, "do_center_crop", False) or getattr(
+            image_processor, "do_pad", False
+        ):
+            return
+        # _normalize hard-codes the 1/255 rescale; bail out on processors
+        # with a different factor
+        rescale_factor = getattr(image_processor, "rescale_factor", 1 / 255)
+        if abs(rescale_factor - 1 / 255) > 1e-9:
+            return
+        resample = getattr(image_processor, "resample", None)
+        # NEAREST is 0, so a truthiness check would drop it
+        self._pp_resample = Image.BILINEAR if resample is None else resample
+        self._pp_size = (size["width"], size["height"])
+        self._pp_mean = torch.tensor(
+            image_processor.image_mean, dtype=torch.float32, device=self.device
+        ).view(3, 1, 1)
+        self._pp_std = torch.tensor(
+            image_processor.image_std, dtype=torch.float32, device=self.device
+        ).view(3, 1, 1)
+
+        # Specialize cast+normalize for the (immutable) constants resolved
+        # above; with static shapes Inductor fuses this into a single kernel
+        mean, std = self._pp_mean, self._pp_std
+
+        def _normalize(x_u8: torch.Tensor) -> torch.Tensor:
+            return (x_u8.to(torch.float32) / 255.0 - mean) / std
+
+        if self.compile and self.device.type == "cuda":
+            _normalize = torch.compile(_normalize, fullgraph=True, dynamic=False)
+        self._normalize = _normalize
+
+    def _fast_preprocess(self, images: Sequence[Image.Image]) -> torch.Tensor:
+        """
+        Resize in uint8 (4x fewer bytes than float32), stack once, then
+        cast+normalize on-device.
+        """
+        width, height = self._pp_size
+        # Callers are expected to pass RGB images already; only convert
+        # stragglers instead of re-allocating every image
+        resized = [
+            (im if im.mode == "RGB" else im.convert("RGB")).resize(
+                (width, height), self._pp_resample
+            )
+            for im in images
+        ]
+        n = len(resized)
+        if self.device.type == "cuda":
+            # Write resized images straight into one preallocated pinned
+            # buffer instead of stacking into a fresh host tensor per batch
+            if self._staging is None or self._staging.shape[0] < n:
+                self._staging = torch.empty(
+                    (max(n, self.batch_size), height, width, 3),
+                    dtype=torch.uint8, pin_memory=True
+                )
+            if self._staging_event is not None:
+                # Previous batch's async H2D must be done before overwriting
+                self._staging_event.synchronize()
+            for i, im in enumerate(resized):
+                np.copyto(self._staging[i].numpy(), np.asarray(im))
+            pixel_values = self._staging[:n].to(self.device, non_blocking=True)
+            self._staging_event = torch.cuda.Event()
+            self._staging_event.record()
+        else:
+            arr = np.stack([np.asarray(im) for im in resized])
+            pixel_values = torch.from_numpy(arr)
+        pixel_values = pixel_values.permute(0, 3, 1, 2).contiguous()
+        return self._normalize(pixel_values)
 
     def preprocess(self, images: Sequence[Image.Image]) -> torch.Tensor:
         """Convert PIL images to model input tensor."""
         raise NotImplementedError
 
     @torch.inference_mode()
-    def generate(self, pixel_values: torch.Tensor) -> torch.LongTensor:
+    def encode(self, pixel_values: torch.Tensor):
+        """Run the vision encoder once; the result can be fed to generate()."""
+        raise NotImplementedError
+
+    @torch.inference_mode()
+    def generate(
+        self,
+        pixel_values: Optional[torch.Tensor] = None,
+        max_new_tokens: Optional[int] = None,
+        encoder_outputs=None
+    ) -> torch.LongTensor:
         """Generate model outputs (token ids)."""
         raise NotImplementedError
 
@@ -53,32 +337,56 @@ class TrOCRAdapter(BaseHFAdapter):
         model_id: str,
         device: str = "cpu",
         fp16: bool = False,
+        bf16: bool = False,
+        int8: bool = False,
         max_new_tokens: Optional[int] = None,
         quantize_kwargs: Optional[Dict] = None,
-        gen_kwargs: Optional[Dict] = None
+        gen_kwargs: Optional[Dict] = None,
+        compile: bool = False,
+        batch_size: int = 8
     ):
-        super().__init__(model_id, device, fp16, max_new_tokens, quantize_kwargs, gen_kwargs)
-        self.processor = TrOCRProcessor.from_pretrained(model_id)
-        self.model = VisionEncoderDecoderModel.from_pretrained(
-            model_id,
-            **(quantize_kwargs or {})
-        )
-        self.model.to(self.device).eval()
-        if self.fp16 and self.device.type == "cuda":
-            self.model.half()
+        super().__init__(model_id, device, fp16, bf16, int8, max_new_tokens, quantize_kwargs, gen_kwargs, compile, batch_size)
+        self.processor = _cached_trocr_processor(model_id)
+        self.model = self._load_model(VisionEncoderDecoderModel.from_pretrained)
+        self._place_model()
+        self._maybe_quantize_cpu()
+        self._init_generation_config()
+        self.model.encoder = self._maybe_compile_encoder(self.model.encoder)
+        self._init_preprocess_cache()
 
     def preprocess(self, images: Sequence[Image.Image]) -> torch.Tensor:
-        images = [im.convert("RGB") for im in images]
+        if self._pp_size is not None:
+            return self._fast_preprocess(images)
         batch = self.processor(images=images, return_tensors="pt")
         return batch.pixel_values.to(self.device)
 
     @torch.inference_mode()
-    def generate(self, pixel_values: torch.Tensor) -> torch.LongTensor:
-        # Combine default gen_kwargs and max_new_tokens
-        kwargs = dict(self.gen_kwargs)
-        if self.max_new_tokens is not None:
-            kwargs["max_new_tokens"] = self.max_new_tokens
-        return self.model.generate(pixel_values, **kwargs)
+    def encode(self, pixel_values: torch.Tensor):
+        with self._autocast():
+            return self.model.encoder(pixel_values, return_dict=True)
+
+    @torch.inference_mode()
+    def generate(
+        self,
+        pixel_values: Optional[torch.Tensor] = None,
+        max_new_tokens: Optional[int] = None,
+        encoder_outputs=None
+    ) -> torch.LongTensor:
+        # Per-batch override on top of the frozen GenerationConfig
+        kwargs = {}
+        if max_new_tokens is not None:
+            kwargs["max_new_tokens"] = max_new_tokens
+        with self._autocast():
+            # Always run the encoder explicitly: the (possibly compiled)
+            # graph is hit exactly once per batch, and callers can reuse
+            # encoder_outputs across repeated generate calls
+            if encoder_outputs is None:
+                encoder_outputs = self.model.encoder(pixel_values, return_dict=True)
+            return self.model.generate(
+                encoder_outputs=encoder_outputs,
+                generation_config=self._gen_config,
+                stopping_criteria=self._stopping_criteria, **kwargs
+            )
 
     def decode(self, outputs: torch.LongTensor) -> List[str]:
         return self.processor.batch_decode(outputs, skip_special_tokens=True)
@@ -93,22 +401,41 @@ class AutoV2SAdapter(BaseHFAdapter):
         model_id: str,
         device: str = "cpu",
         fp16: bool = False,
+        bf16: bool = False,
+        int8: bool = False,
         max_new_tokens: Optional[int] = None,
         quantize_kwargs: Optional[Dict] = None,
-        gen_kwargs: Optional[Dict] = None
+        gen_kwargs: Optional[Dict] = None,
+        compile: bool = False,
+        batch_size: int = 8
     ):
-        super().__init__(model_id, device, fp16, max_new_tokens, quantize_kwargs, gen_kwargs)
-        self.processor = AutoProcessor.from_pretrained(model_id)
-        self.model = AutoModelForVision2Seq.from_pretrained(
-            model_id,
-            **(quantize_kwargs or {})
+        super().__init__(model_id, device, fp16, bf16, int8, max_new_tokens, quantize_kwargs, gen_kwargs, compile, batch_size)
+        self.processor = _cached_auto_processor(model_id)
+        self.model = self._load_model(AutoModelForVision2Seq.from_pretrained)
+        self._place_model()
+        self._maybe_quantize_cpu()
+        self._init_generation_config()
+        # Vision2Seq models name their encoder either 'encoder' or 'vision_model'
+        self._encoder_attr = "encoder" if hasattr(self.model, "encoder") else (
+            "vision_model" if hasattr(self.model, "vision_model") else None
         )
-        self.model.to(self.device).eval()
-        if self.fp16 and self.device.type == "cuda":
-            self.model.half()
+        # Only true encoder-decoder models accept encoder_outputs= in
+        # generate; e.g. BLIP has a vision_model but requires pixel_values
+        self._use_encoder_outputs = (
+            self._encoder_attr is not None
+            and getattr(self.model.config, "is_encoder_decoder", False)
+        )
+        self.supports_encoder_outputs = self._use_encoder_outputs
+        if self._encoder_attr is not None:
+            setattr(
+                self.model, self._encoder_attr,
+                self._maybe_compile_encoder(getattr(self.model, self._encoder_attr))
+            )
+        self._init_preprocess_cache()
 
     def preprocess(self, images: Sequence[Image.Image]) -> torch.Tensor:
-        images = [im.convert("RGB") for im in images]
+        if self._pp_size is not None:
+            return self._fast_preprocess(images)
         batch = self.processor(images=images, return_tensors="pt")
         pixel_values = batch.get("pixel_values")
         if pixel_values is None:
@@ -116,11 +443,112 @@ class AutoV2SAdapter(BaseHFAdapter):
         return pixel_values.to(self.device)
 
     @torch.inference_mode()
-    def generate(self, pixel_values: torch.Tensor) -> torch.LongTensor:
-        kwargs = dict(self.gen_kwargs)
-        if self.max_new_tokens is not None:
-            kwargs["max_new_tokens"] = self.max_new_tokens
-        return self.model.generate(pixel_values, **kwargs)
+    def encode(self, pixel_values: torch.Tensor):
+        if not self._use_encoder_outputs:
+            return None
+        with self._autocast():
+            return getattr(self.model, self._encoder_attr)(
+                pixel_values, return_dict=True
+            )
+
+    @torch.inference_mode()
+    def generate(
+        self,
+        pixel_values: Optional[torch.Tensor] = None,
+        max_new_tokens: Optional[int] = None,
+        encoder_outputs=None
+    ) -> torch.LongTensor:
+        kwargs = {}
+        if max_new_tokens is not None:
+            kwargs["max_new_tokens"] = max_new_tokens
+        with self._autocast():
+            if encoder_outputs is None and self._use_encoder_outputs:
+                encoder_outputs = getattr(self.model, self._encoder_attr)(
+                    pixel_values, return_dict=True
+                )
+            if encoder_outputs is not None:
+                return self.model.generate(
+                    encoder_outputs=encoder_outputs,
+                    generation_config=self._gen_config,
+                    stopping_criteria=self._stopping_criteria, **kwargs
+                )
+            return self.model.generate(
+                pixel_values, generation_config=self._gen_config,
+                stopping_criteria=self._stopping_criteria, **kwargs
+            )
+
+    def decode(self, outputs: torch.LongTensor) -> List[str]:
+        return self.processor.batch_decode(outputs, skip_special_tokens=True)
+
+
+class ORTAdapter(BaseHFAdapter):
+    """
+    ONNX Runtime backend via optimum, for CPU deployments where PyTorch
+    eager execution is the slow option. Exports the model to ONNX on
+    first load; uses the OpenVINO execution provider when available.
+    """
+    supports_encoder_outputs = False
+
+    def __init__(
+        self,
+        model_id: str,
+        device: str = "cpu",
+        fp16: bool = False,
+        bf16: bool = False,
+        int8: bool = False,
+        max_new_tokens: Optional[int] = None,
+        quantize_kwargs: Optional[Dict] = None,
+        gen_kwargs: Optional[Dict] = None,
+        compile: bool = False,
+        batch_size: int = 8
+    ):
+        super().__init__(model_id, device, fp16, bf16, int8, max_new_tokens, quantize_kwargs, gen_kwargs, compile, batch_size)
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForVision2Seq
+        except ImportError as e:
+            raise ImportError(
+                "backend 'ort' requires the optional dependencies "
+                "optimum[onnxruntime] (or onnxruntime-openvino)"
+            ) from e
+        self.processor = _cached_auto_processor(model_id)
+        available = onnxruntime.get_available_providers()
+        provider = (
+            "OpenVINOExecutionProvider"
+            if "OpenVINOExecutionProvider" in available
+            else "CPUExecutionProvider"
+        )
+        self.model = ORTModelForVision2Seq.from_pretrained(
+            model_id, export=True, provider=provider
+        )
+        self._init_generation_config()
+        self._init_preprocess_cache()
+
+    def preprocess(self, images: Sequence[Image.Image]) -> torch.Tensor:
+        if self._pp_size is not None:
+            return self._fast_preprocess(images)
+        batch = self.processor(images=images, return_tensors="pt")
+        return batch.pixel_values
+
+    @torch.inference_mode()
+    def encode(self, pixel_values: torch.Tensor):
+        # ORT sessions are driven through generate() as a whole
+        return None
+
+    @torch.inference_mode()
+    def generate(
+        self,
+        pixel_values: Optional[torch.Tensor] = None,
+        max_new_tokens: Optional[int] = None,
+        encoder_outputs=None
+    ) -> torch.LongTensor:
+        kwargs = {}
+        if max_new_tokens is not None:
+            kwargs["max_new_tokens"] = max_new_tokens
+        return self.model.generate(
+            pixel_values, generation_config=self._gen_config,
+            stopping_criteria=self._stopping_criteria, **kwargs
+        )
 
     def decode(self, outputs: torch.LongTensor) -> List[str]:
         return self.processor.batch_decode(outputs, skip_special_tokens=True)
@@ -130,34 +558,53 @@ def build_adapter(
     model_id: str,
     device: str = "cpu",
     fp16: bool = False,
+    bf16: bool = False,
+    int8: bool = False,
     max_new_tokens: Optional[int] = None,
     quantize_kwargs: Optional[Dict] = None,
-    gen_kwargs: Optional[Dict] = None
+    gen_kwargs: Optional[Dict] = None,
+    compile: bool = False,
+    batch_size: int = 8,
+    backend: str = "pt"
 ) -> BaseHFAdapter:
     """
-    Factory: pick adapter based on model config or name.
+    Factory: pick adapter based on backend and model config or name.
 
+    - If backend is "ort", use ORTAdapter (ONNX Runtime via optimum)
     - If config.model_type suggests vision-encoder-decoder / trocr, use TrOCRAdapter
     - Else fallback to AutoV2SAdapter
     """
-    cfg = AutoConfig.from_pretrained(model_id)
+    if backend == "ort":
+        return ORTAdapter(
+            model_id, device=device, fp16=fp16, bf16=bf16, int8=int8,
+            max_new_tokens=max_new_tokens,
+            quantize_kwargs=quantize_kwargs,
+            gen_kwargs=gen_kwargs,
+            compile=compile,
+            batch_size=batch_size
+        )
+    cfg = _cached_config(model_id)
     model_type = getattr(cfg, "model_type", "")
     # Some TrOCR models have model_type "vision-encoder-decoder" or "trocr"
     if model_type in {"trocr", "vision-encoder-decoder"}:
         try:
             return TrOCRAdapter(
-                model_id, device=device, fp16=fp16,
+                model_id, device=device, fp16=fp16, bf16=bf16, int8=int8,
                 max_new_tokens=max_new_tokens,
                 quantize_kwargs=quantize_kwargs,
-                gen_kwargs=gen_kwargs
+                gen_kwargs=gen_kwargs,
+                compile=compile,
+                batch_size=batch_size
             )
         except Exception as e:
             # fallback with warning
             print(f"[Warning] TrOCRAdapter init failed for '{model_id}': {e}")
     # Fallback
     return AutoV2SAdapter(
-        model_id, device=device, fp16=fp16,
+        model_id, device=device, fp16=fp16, bf16=bf16, int8=int8,
         max_new_tokens=max_new_tokens,
         quantize_kwargs=quantize_kwargs,
-        gen_kwargs=gen_kwargs
+        gen_kwargs=gen_kwargs,
+        compile=compile,
+        batch_size=batch_size
     )
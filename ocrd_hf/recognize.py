@@ -1,14 +1,36 @@
 from __future__ import annotations
+import multiprocessing as mp
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from typing import Optional, List
+import numpy as np
 from PIL import Image
 import torch
 
 from ocrd import Processor, OcrdPage, OcrdPageResult
 from ocrd_utils import VERSION as OCRD_VERSION
+from ocrd_utils import bbox_from_polygon, coordinates_of_segment
 from ocrd_models.ocrd_page import TextEquivType
 
 from .adapters import build_adapter
 
+# Per-worker adapter for the CPU process pool; each worker loads the
+# model once at pool init and keeps it for its lifetime
+_WORKER_ADAPTER = None
+
+
+def _init_worker(model_id, adapter_kwargs):
+    global _WORKER_ADAPTER
+    torch.set_grad_enabled(False)
+    _WORKER_ADAPTER = build_adapter(model_id, **adapter_kwargs)
+
+
+def _worker_predict(images, max_new_tokens):
+    pixel_values = _WORKER_ADAPTER.preprocess(images)
+    outputs = _WORKER_ADAPTER.generate(pixel_values, max_new_tokens=max_new_tokens)
+    return [t.strip() for t in _WORKER_ADAPTER.decode(outputs)]
+
 
 class HFRecognize(Processor):
     """
@@ -42,24 +64,93 @@ class HFRecognize(Processor):
             model_path = model_id
 
         device = self.parameter.get("device", "cpu")
+        if device.startswith("cuda"):
+            # Fixed input sizes: let cuDNN autotune conv algorithms once,
+            # and allow TF32 matmul on Ampere+ for the ViT encoder
+            torch.backends.cudnn.benchmark = True
+            torch.set_float32_matmul_precision("high")
+
         fp16 = bool(self.parameter.get("fp16", False))
+        bf16 = bool(self.parameter.get("bf16", False))
+        int8 = bool(self.parameter.get("int8", False))
+        compile_model = bool(self.parameter.get("compile", False))
         max_new_tokens = self.parameter.get("max_new_tokens", None)
+        self.max_new_tokens = max_new_tokens
         self.batch_size = int(self.parameter.get("batch_size", 8))
+        # 0 = derive pixels-per-character from line height
+        self.px_per_char = int(self.parameter.get("px_per_char", 0))
+        num_workers = int(self.parameter.get("num_workers", 1))
+        backend = self.parameter.get("backend", "pt")
 
-        self.adapter = build_adapter(
-            model_path,
+        adapter_kwargs = dict(
+            backend=backend,
             device=device,
             fp16=fp16,
-            max_new_tokens=max_new_tokens
+            bf16=bf16,
+            int8=int8,
+            max_new_tokens=max_new_tokens,
+            compile=compile_model,
+            batch_size=self.batch_size
         )
 
+        self.adapter = None
+        self._mp_pool = None
+        self._enc_stream = None
+        if device == "cpu" and num_workers > 1:
+            # Multi-socket CPU deployments: dispatch batches round-robin to
+            # a persistent pool of worker processes, each with its own
+            # model, instead of serializing everything behind one GIL
+            ctx = mp.get_context("spawn")
+            self._mp_pool = ctx.Pool(
+                num_workers,
+                initializer=_init_worker,
+                initargs=(model_path, adapter_kwargs)
+            )
+        else:
+            self.adapter = build_adapter(model_path, **adapter_kwargs)
+            # Side stream for encoder prefetch: while the decoder of batch N
+            # autoregressively generates on the default stream, the encoder
+            # of batch N+1 can already run, since the two share no data
+            self._enc_stream = (
+                torch.cuda.Stream() if self.adapter.device.type == "cuda" else None
+            )
+
         # Feature selection for image cropping: leave blank to allow full color/gray input
         self.features: str = ""
 
+        # Tokenizer decode is a pure-Python loop; run it on a worker thread
+        # so the next batch's preprocess+generate starts immediately
+        self._decode_pool = ThreadPoolExecutor(max_workers=1)
+        self._pending_decodes: List = []
+
+        # Line crops are independent pure-CPU work; PIL/numpy release the
+        # GIL in their C code, so a thread pool overlaps them
+        self._crop_pool = ThreadPoolExecutor(
+            max_workers=max(1, (os.cpu_count() or 2) // 2)
+        )
+
+        # Everything from here on is inference: disable autograd globally
+        # so tensor ops outside generate() (e.g. normalization in
+        # preprocess) don't allocate autograd bookkeeping
+        self._inference_ctx = ExitStack()
+        self._inference_ctx.enter_context(torch.inference_mode())
+        torch.set_grad_enabled(False)
+
     def shutdown(self):
         """If adapter needs cleanup (optional)."""
-        # Example: if adapter holds GPU memory or threads, free them here.
-        pass
+        if getattr(self, "_decode_pool", None) is not None:
+            self._decode_pool.shutdown(wait=True)
+            self._decode_pool = None
+        if getattr(self, "_crop_pool", None) is not None:
+            self._crop_pool.shutdown(wait=True)
+            self._crop_pool = None
+        if getattr(self, "_mp_pool", None) is not None:
+            self._mp_pool.close()
+            self._mp_pool.join()
+            self._mp_pool = None
+        if getattr(self, "_inference_ctx", None) is not None:
+            self._inference_ctx.close()
+            self._inference_ctx = None
 
     def process_page_pcgts(
         self,
@@ -87,7 +178,13 @@ class HFRecognize(Processor):
             self.logger.warning("No TextLine elements on page '%s'", page_id)
             return OcrdPageResult(pcgts)
 
-        # For each region: crop region-image, then crop lines, batch predict, write
+        # Accumulate line images across *all* regions so the batch fill
+        # factor does not collapse on pages with many small regions
+        page_batch: List = []
+
+        # Fan the independent per-line crops out to the thread pool; results
+        # are consumed in document order below
+        crop_futures: List = []
         for region in regions:
             lines = region.get_TextLine() or []
             if not lines:
@@ -97,62 +194,242 @@ class HFRecognize(Processor):
             region_image, region_coords = self.workspace.image_from_segment(
                 region, page_image, page_coords, feature_selector=self.features
             )
-
-            batch_imgs: List[Image.Image] = []
-            batch_line_objs: List = []
+            # Materialize the region once; line crops then become cheap
+            # array slices instead of full PIL crop+transform pipelines
+            region_arr = np.asarray(region_image)
 
             for line in lines:
+                crop_futures.append((line, region, self._crop_pool.submit(
+                    self._crop_line, line, region, region_image, region_coords, region_arr
+                )))
+
+        for line, region, future in crop_futures:
+            line_image = future.result()
+            if line_image is None:
+                continue
+
+            # Skip too tiny lines
+            w, h = line_image.size
+            if w < 2 or h < 2:
+                self.logger.warning(
+                    "Skipping tiny/invalid line '%s' in region '%s' (%dx%d)",
+                    getattr(line, "id", "?"), getattr(region, "id", "?"), w, h
+                )
+                continue
+
+            # .convert allocates a fresh image even for a no-op conversion
+            if line_image.mode != "RGB":
+                line_image = line_image.convert("RGB")
+            page_batch.append((line_image, line))
+
+        # Group similarly-sized lines into the same batch so padding (and
+        # decoder steps) are not dictated by one outlier line per batch
+        page_batch.sort(key=lambda item: (item[0].width // 32, item[0].height // 32))
+
+        batches = []
+        for start in range(0, len(page_batch), self.batch_size):
+            chunk = page_batch[start:start + self.batch_size]
+            imgs = [img for img, _ in chunk]
+            line_objs = [line for _, line in chunk]
+            batches.append((imgs, line_objs, self._estimate_max_new_tokens(imgs)))
+        self._process_batches(batches)
+
+        # All decodes must have written their TextEquivs before the page
+        # is serialized
+        for future in self._pending_decodes:
+            future.result()
+        self._pending_decodes.clear()
+
+        return OcrdPageResult(pcgts)
+
+    def _process_batches(self, batches: List):
+        """
+        Run all batches of a page, overlapping each batch's encoder forward
+        (on a side CUDA stream) with the previous batch's decoder loop.
+        """
+        if self._mp_pool is not None:
+            # Thin dispatcher: fan batches out to the worker processes,
+            # then collect results in order and write back
+            results = [
+                (
+                    self._mp_pool.apply_async(_worker_predict, (imgs, max_new_tokens)),
+                    line_objs,
+                    len(imgs)
+                )
+                for imgs, line_objs, max_new_tokens in batches
+            ]
+            for result, line_objs, n_images in results:
                 try:
-                    line_image, _ = self.workspace.image_from_segment(
-                        line, region_image, region_coords, feature_selector=self.features
-                    )
+                    texts = result.get()
                 except Exception as e:
                     self.logger.error(
-                        "Could not crop line '%s' in region '%s': %s",
-                        getattr(line, "id", "?"), getattr(region, "id", "?"), e
+                        "HF inference failed in worker on batch size %d: %s",
+                        n_images, e
                     )
                     continue
+                self._write_texts(line_objs, texts)
+            return
 
-                # Skip too tiny lines
-                w, h = line_image.size
-                if w < 2 or h < 2:
-                    self.logger.warning(
-                        "Skipping tiny/invalid line '%s' in region '%s' (%dx%d)",
-                        getattr(line, "id", "?"), getattr(region, "id", "?"), w, h
-                    )
-                    continue
+        if self._enc_stream is None or not getattr(
+            self.adapter, "supports_encoder_outputs", False
+        ):
+            # No stream to overlap on, or the adapter cannot hand
+            # encoder_outputs to generate — in that case the pipeline below
+            # would preprocess every batch twice for no overlap
+            for imgs, line_objs, max_new_tokens in batches:
+                self._predict_and_write(imgs, line_objs, max_new_tokens=max_new_tokens)
+            return
 
-                batch_imgs.append(line_image.convert("RGB"))
-                batch_line_objs.append(line)
+        default_stream = torch.cuda.current_stream()
+        pending = None  # (encoder_outputs, event, lines, max_new_tokens, batch len)
+        for imgs, line_objs, max_new_tokens in batches:
+            try:
+                pixel_values = self.adapter.preprocess(imgs)
+                self._enc_stream.wait_stream(default_stream)
+                with torch.cuda.stream(self._enc_stream):
+                    encoder_outputs = self.adapter.encode(pixel_values)
+                # pixel_values was allocated on the default stream; tell the
+                # caching allocator the side stream is still reading it, or
+                # its block could be recycled for the next batch mid-encode
+                pixel_values.record_stream(self._enc_stream)
+                event = torch.cuda.Event()
+                event.record(self._enc_stream)
+            except Exception as e:
+                self.logger.error(
+                    "HF encoder failed on batch size %d: %s", len(imgs), e
+                )
+                continue
+            if encoder_outputs is None:
+                # No separable encoder submodule: process synchronously
+                self._predict_and_write(imgs, line_objs, max_new_tokens=max_new_tokens)
+                continue
+            if pending is not None:
+                self._decode_pending(*pending)
+            pending = (encoder_outputs, event, line_objs, max_new_tokens, len(imgs))
+        if pending is not None:
+            self._decode_pending(*pending)
 
-                # Flush when enough
-                if len(batch_imgs) >= self.batch_size:
-                    self._predict_and_write(batch_imgs, batch_line_objs)
-                    batch_imgs = []
-                    batch_line_objs = []
+    def _decode_pending(self, encoder_outputs, event, lines, max_new_tokens, n_images):
+        """Generate from prefetched encoder outputs and write back."""
+        stream = torch.cuda.current_stream()
+        stream.wait_event(event)
+        # Mirror image of the pixel_values case: these tensors were
+        # allocated on the side stream but are consumed here
+        for tensor in getattr(encoder_outputs, "to_tuple", tuple)():
+            if isinstance(tensor, torch.Tensor):
+                tensor.record_stream(stream)
+        try:
+            outputs = self.adapter.generate(
+                encoder_outputs=encoder_outputs, max_new_tokens=max_new_tokens
+            )
+        except Exception as e:
+            self.logger.error(
+                "HF inference failed on batch size %d: %s", n_images, e
+            )
+            return
+        self._pending_decodes.append(
+            self._decode_pool.submit(self._finish_batch, outputs.cpu(), lines, n_images)
+        )
 
-            # Flush leftover
-            if batch_imgs:
-                self._predict_and_write(batch_imgs, batch_line_objs)
+    def _crop_line(
+        self,
+        line,
+        region,
+        region_image: Image.Image,
+        region_coords: dict,
+        region_arr: np.ndarray
+    ) -> Optional[Image.Image]:
+        """
+        Crop a TextLine from the already-materialized region image.
 
-        return OcrdPageResult(pcgts)
+        Slices the region array at the line's bounding box, which is O(bbox)
+        instead of a full image_from_segment pipeline per line. Falls back
+        to image_from_segment when the region is deskewed, the line carries
+        an AlternativeImage (e.g. binarized/dewarped by an earlier pipeline
+        step, which image_from_segment would prefer), or the fast path fails.
+        """
+        line_image = None
+        if (
+            # Palette and exotic modes don't round-trip through numpy
+            # (np.asarray on a "P" image yields the palette indices)
+            region_image.mode in ("RGB", "L")
+            and not region_coords.get("angle", 0)
+            and not line.get_AlternativeImage()
+        ):
+            try:
+                polygon = coordinates_of_segment(line, region_image, region_coords)
+                x0, y0, x1, y1 = bbox_from_polygon(polygon)
+                x0 = max(0, int(x0))
+                y0 = max(0, int(y0))
+                x1 = min(region_image.width, int(np.ceil(x1)))
+                y1 = min(region_image.height, int(np.ceil(y1)))
+                if x1 > x0 and y1 > y0:
+                    line_image = Image.fromarray(region_arr[y0:y1, x0:x1])
+            except Exception as e:
+                self.logger.debug(
+                    "Fast crop failed for line '%s', falling back: %s",
+                    getattr(line, "id", "?"), e
+                )
+        if line_image is None:
+            try:
+                line_image, _ = self.workspace.image_from_segment(
+                    line, region_image, region_coords, feature_selector=self.features
+                )
+            except Exception as e:
+                self.logger.error(
+                    "Could not crop line '%s' in region '%s': %s",
+                    getattr(line, "id", "?"), getattr(region, "id", "?"), e
+                )
+                return None
+        return line_image
+
+    def _estimate_max_new_tokens(self, images: List[Image.Image]) -> Optional[int]:
+        """
+        Estimate an upper bound on output tokens for a batch from line
+        geometry (characters are roughly half as wide as the line is high),
+        clamped by the configured max_new_tokens if any.
+        """
+        estimate = 0
+        for img in images:
+            w, h = img.size
+            px_per_char = self.px_per_char or max(4, h // 2)
+            estimate = max(estimate, w // px_per_char + 8)
+        configured = self.max_new_tokens
+        if configured is not None:
+            return min(int(configured), estimate)
+        return estimate
 
     def _predict_and_write(
         self,
         images: List[Image.Image],
-        lines: List
+        lines: List,
+        max_new_tokens: Optional[int] = None
     ):
         """Run adapter and write back to TextLine elements."""
         try:
             pixel_values = self.adapter.preprocess(images)
-            outputs = self.adapter.generate(pixel_values)
-            texts = [t.strip() for t in self.adapter.decode(outputs)]
+            outputs = self.adapter.generate(pixel_values, max_new_tokens=max_new_tokens)
         except Exception as e:
             self.logger.error(
                 "HF inference failed on batch size %d: %s", len(images), e
             )
             return
+        self._pending_decodes.append(
+            self._decode_pool.submit(self._finish_batch, outputs.cpu(), lines, len(images))
+        )
+
+    def _finish_batch(self, outputs, lines: List, n_images: int):
+        """Tokenizer decode + write-back; runs on the decode worker thread."""
+        try:
+            texts = [t.strip() for t in self.adapter.decode(outputs)]
+        except Exception as e:
+            self.logger.error(
+                "HF decoding failed on batch size %d: %s", n_images, e
+            )
+            return
+        self._write_texts(lines, texts)
 
+    def _write_texts(self, lines: List, texts: List[str]):
         for line, txt in zip(lines, texts):
             if line.get_TextEquiv():
                 line.set_TextEquiv([])  # clear any existing